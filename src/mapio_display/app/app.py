@@ -1,31 +1,177 @@
 """Main app to control MAPIO display."""
 
 import datetime
-import hashlib
-import os
-import random
-import string
+import secrets
+import selectors
+import socket
 import subprocess  # nosec
 import threading
 import time
-from collections import deque
-from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum, IntEnum
+from functools import cache, cached_property, lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Optional
 
 import netifaces  # type: ignore
 import netifaces as ni  # type: ignore
 import psutil  # type: ignore
-import qrcode
-from gpiod import chip, line_request  # type: ignore
+from gpiod import line_request  # type: ignore
 from loguru import logger
 from netifaces import AF_INET  # type: ignore
 from PIL import Image, ImageDraw, ImageFont  # type: ignore
 
+from mapio_display.app.utils import battery_percent, bbox_diff, format_uptime
 from mapio_display.epd.epd import EPD
+from mapio_display.gpio.gpio import get_chip, read_events
 from mapio_display.leds.leds import LED
 
 SCREEN_REFRESH_PERIOD_S = 60
+# Quiet time after a refresh request before rendering, coalesces fast button presses
+REFRESH_SETTLE_S = 0.15
+# LEDs only change when the docker or battery state changes
+LEDS_REFRESH_PERIOD_S = 5
+# Partial refreshes in a row before a full refresh clears the ghosting
+PARTIAL_REFRESH_LIMIT = 10
+# Ratio of the screen that can change for a partial refresh to be used
+PARTIAL_REFRESH_MAX_AREA = 0.3
+# Fast full refreshes in a row before a normal full refresh drives the pixels fully again
+FAST_REFRESH_LIMIT = 5
+# Internet connection is checked by opening a TCP connection to a public DNS
+INTERNET_CHECK_ADDRESS = ("8.8.8.8", 53)
+INTERNET_CHECK_TIMEOUT_S = 1.0
+INTERNET_SAMPLE_PERIOD_S = 10.0
+# Services monitored by the application, their state is queried in a single call
+MONITORED_SERVICES = ("docker.service", "mapio-webserver-back", "wpa_supplicant-ap")
+# Services started and stopped together from the setup view
+WEBSERVER_SERVICES = ("mapio-webserver-back", "nginx")
+# System state shown by the views and the LEDs is sampled in the background
+SYSTEM_SAMPLE_PERIOD_S = 5.0
+# The IP address rarely changes, it is looked up less often
+IP_SAMPLE_PERIOD_S = 30.0
+CPU_TEMPERATURE_PATH = Path("/sys/class/thermal/thermal_zone0/temp")
+
+CUSTOM_IMAGE_PATH = Path("/usr/local/homeassistant/media/epaper.jpg")
+LOGO_PATH = Path(__file__).parent.parent / "images" / "mapio_logo_bw104x122.jpg"
+FONT_PATH = "/usr/share/fonts/ttf/LiberationMono-Bold.ttf"
+
+# Events of a button closer than this to its previous event are contact bounces
+BUTTON_DEBOUNCE_S = 0.2
+
+# Charger boost status GPIO (active low)
+CHG_BOOST_N_CHIP = 2
+CHG_BOOST_N_LINE = 10
+
+
+@cache
+def _get_font(size: int) -> ImageFont.FreeTypeFont:
+    """Get the ePaper font, each size is only loaded once.
+
+    Args:
+        size (int): Font size
+
+    Returns:
+        ImageFont.FreeTypeFont: The font
+    """
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+@lru_cache(maxsize=256)
+def _render_text(text: str, size: int) -> tuple[Image.Image, tuple[int, int]]:
+    """Render a text in the ePaper font, each text is only rendered once.
+
+    Args:
+        text (str): Text to render
+        size (int): Font size
+
+    Returns:
+        tuple[Image.Image, tuple[int, int]]: Mask of the text pixels and its
+            offset from the text position
+    """
+    font = _get_font(size)
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new("1", (max(right - left, 1), max(bottom - top, 1)), 0)
+    draw: Any = ImageDraw.Draw(mask)
+    draw.text((-left, -top), text, font=font, fill=255)
+    return mask, (left, top)
+
+
+def _paste_text(image: Image.Image, xy: tuple[int, int], text: str, size: int) -> None:
+    """Draw a text in black, like ImageDraw.text but from a cached rendering.
+
+    Args:
+        image (Image.Image): Image to draw on
+        xy (tuple[int, int]): Text position
+        text (str): Text to draw
+        size (int): Font size
+    """
+    mask, (left, top) = _render_text(text, size)
+    image.paste(0, (xy[0] + left, xy[1] + top), mask)
+
+
+@lru_cache(maxsize=8)
+def _make_qr(payload: str) -> Image.Image:
+    """Encode a payload as a QR code, each payload is only encoded once.
+
+    Args:
+        payload (str): Data to encode
+
+    Returns:
+        Image.Image: The 80x80 QR code image
+    """
+    # Only the setup view needs QR codes, do not load the module at startup
+    import qrcode
+
+    qr_code: Any = qrcode.QRCode(  # type: ignore
+        error_correction=qrcode.constants.ERROR_CORRECT_H, border=0  # type: ignore
+    )
+    qr_code.add_data(payload)
+    return qr_code.make_image().resize((80, 80))
+
+
+@lru_cache(maxsize=4)
+def _make_ap_label(wifi_passwd: str) -> Image.Image:
+    """Render the vertical access point credentials label of the setup view.
+
+    Args:
+        wifi_passwd (str): The access point password
+
+    Returns:
+        Image.Image: The label, rotated by 90°
+    """
+    text_layer = Image.new("1", (90, 30), 255)
+    _paste_text(text_layer, (0, 0), "SSID:MAPIO", 12)
+    _paste_text(text_layer, (0, 15), f"PASS:{wifi_passwd}", 12)
+    return text_layer.rotate(90.0, expand=True)
+
+
+@lru_cache(maxsize=1)
+def _read_os_version() -> str:
+    """Read the MAPIO OS version from /etc/os-release.
+
+    The version cannot change while the application is running, so the file
+    is only parsed once.
+
+    Returns:
+        str: The MAPIO OS version, "None" if it cannot be found
+    """
+    try:
+        for line in Path("/etc/os-release").read_text().splitlines():
+            if line.startswith("MAPIO_OS_VERSION="):
+                return line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return "None"
+
+
+def _read_uptime() -> str:
+    """Read the system uptime from /proc/uptime.
+
+    Returns:
+        str: The uptime formatted like the uptime command ("3 days", "2:03" or "5 min")
+    """
+    seconds = int(float(Path("/proc/uptime").read_text().split()[0]))
+    return format_uptime(seconds)
 
 
 class BatteryState(Enum):
@@ -36,6 +182,16 @@ class BatteryState(Enum):
     critical = "CRITICAL_BATTERY"
 
 
+class View(IntEnum):
+    """Enum that represents screen views."""
+
+    home = 0
+    status = 1
+    setup = 2
+    system = 3
+    custom = 4
+
+
 class MAPIO_CTRL:
     """Contains all display interfaces."""
 
@@ -43,22 +199,70 @@ class MAPIO_CTRL:
         """Initialize MAPIO control object."""
         # ePaper control
         self.epd = EPD()
-        self.views_list = ["HOME", "STATUS", "SETUP", "SYSTEM"]
+        views = [View.home, View.status, View.setup, View.system]
         # check if there is a custom image to print
-        if Path.exists(Path("/usr/local/homeassistant/media/epaper.jpg")):
-            self.views_list.append("CUSTOM")
-        self.views_pool = deque(self.views_list)
-        self.need_refresh = False
-        self.current_view = self.views_pool[0]
+        if CUSTOM_IMAGE_PATH.exists():
+            views.append(View.custom)
+        self.views = tuple(views)
+        # Index of the view selected with buttons, in views
+        self._view_index = 0
+        # Protects the state shared with the buttons handlers (view index, MID press)
+        self.state_lock = threading.RLock()
+        self._view_generators: dict[View, Callable[[], Image.Image]] = {
+            View.home: self._generate_home_view,
+            View.status: self._generate_status_view,
+            View.setup: self._generate_setup_view,
+            View.system: self._generate_system_view,
+            View.custom: self._generate_custom_view,
+        }
+        # Set to wake up the refresh screen task before its next periodic refresh
+        self.refresh_event = threading.Event()
+        # Set to wake up the refresh leds task when another task drove the LEDs
+        self.leds_event = threading.Event()
+        self.current_view = self.views[0]
         self.mid_press = False
 
-        # ePaper Fonts
-        font_path = "/usr/share/fonts/ttf/LiberationMono-Bold.ttf"
-        self.font12 = ImageFont.truetype(font_path, 12)
-        self.font15 = ImageFont.truetype(font_path, 15)
-        self.font19 = ImageFont.truetype(font_path, 19)
-        self.font28 = ImageFont.truetype(font_path, 28)
-        self.font40 = ImageFont.truetype(font_path, 40)
+        # Charger boost status
+        config = line_request()
+        config.request_type = line_request.DIRECTION_INPUT
+        config.consumer = "CHG_BOOST_N"
+        self.chg_boost_n_gpio = get_chip(CHG_BOOST_N_CHIP).get_line(CHG_BOOST_N_LINE)
+        self.chg_boost_n_gpio.request(config)
+        # Last custom view as (custom image modification time, view)
+        self._custom_cache: Optional[tuple[float, Image.Image]] = None
+        # Latest system metrics, updated by the sample system task. They stay at 0
+        # until a sample succeeds, the CPU usage is only meaningful from the second one.
+        self.system_metrics: dict[str, float] = {
+            "cpu": 0.0,
+            "ram": 0.0,
+            "emmc": 0.0,
+            "temperature": 0.0,
+        }
+        self.sample(self.sample_system_metrics)
+        # Latest battery reading as (voltage, percent), updated by the sample system task
+        self.battery = (0.0, 0)
+        self.sample(self.sample_battery)
+        # Latest services state as {service: active}, updated by the sample system task
+        self.services: dict[str, bool] = {}
+        self.sample(self.sample_services)
+        # Latest IP address of the default gateway interface, updated by the sample system task
+        self.ip_addr: Optional[str] = None
+        self.sample(self.sample_ip_addr)
+        # Latest internet connection check, updated by the sample system task
+        self.internet_connected = False
+        self.sample(self.sample_internet)
+
+        # Static content of the views, drawn once and copied on each refresh
+        self._blank_template = Image.new("1", (self.epd.height, self.epd.width), 255)
+        self._home_template = self._blank_template.copy()
+        with Image.open(LOGO_PATH) as logo:
+            self._home_template.paste(logo, (2, 2))
+        self._status_template = self._blank_template.copy()
+        draw: Any = ImageDraw.Draw(self._status_template)
+        draw.line([(0, 40), (255, 40)])
+        draw.line([(0, 80), (255, 80)])
+        self._system_template = self._blank_template.copy()
+        _paste_text(self._system_template, (0, 0), "System ", 28)
 
         # Init ePaper
         self.epd.init()
@@ -81,30 +285,50 @@ class MAPIO_CTRL:
 
         # Access point
         self.wifi_passwd = ""  # nosec
+        # Restarting the access point takes seconds, it is done out of the refresh path
+        self._ap_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="access-point")
+        self._ap_future: Optional[Future[None]] = None
+
+    @property
+    def selected_view(self) -> View:
+        """View selected with buttons, displayed on next refresh."""
+        return self.views[self._view_index]
+
+    def rotate_view(self, step: int) -> View:
+        """Select another view.
+
+        Args:
+            step (int): Number of views to move forward (backward if negative)
+
+        Returns:
+            View: The newly selected view
+        """
+        with self.state_lock:
+            self._view_index = (self._view_index + step) % len(self.views)
+            return self.views[self._view_index]
+
+    def _take_mid_press(self) -> bool:
+        """Consume a MID button press.
+
+        Returns:
+            bool: True if MID has been pressed since last call, False otherwise
+        """
+        with self.state_lock:
+            mid_press = self.mid_press
+            self.mid_press = False
+            return mid_press
 
     # ePaper methods
     def get_current_buffered_image(self) -> Any:
         """Get current image as buffered.
 
-        Args:
-            wait (bool, optional): Indicates if wait message is printed. Defaults to False.
-
         Returns:
             Any: The buffered image
         """
-        if self.current_view == "HOME":
-            logger.info("HOME VIEW")
-            image = self._generate_home_view()
-        elif self.current_view == "SYSTEM":
-            image = self._generate_system_view()
-        elif self.current_view == "STATUS":
-            image = self._generate_status_view()
-        elif self.current_view == "SETUP":
-            image = self._generate_setup_view()
-        elif self.current_view == "CUSTOM":
-            image = self._generate_custom_view()
-
-        return self.epd.getbuffer(image)  # type: ignore
+        logger.debug(f"{self.current_view.name.upper()} VIEW")
+        image = self._view_generators[self.current_view]()
+
+        return self.epd.getbuffer(image)
 
     def _generate_custom_view(self) -> Image.Image:
         """Generate the custom view as an image.
@@ -112,13 +336,19 @@ class MAPIO_CTRL:
         Returns:
             Image: The custom view
         """
-        image = Image.new("1", (self.epd.height, self.epd.width), 255)  # 255: clear the fmapio_ctre
-        if Path.exists(Path("/usr/local/homeassistant/media/epaper.jpg")):
-            img = Image.open("/usr/local/homeassistant/media/epaper.jpg")
-            logger.info("Returns custom image")
-            image.paste(img, (0, 0))
-            return image
-        return image
+        try:
+            mtime = CUSTOM_IMAGE_PATH.stat().st_mtime
+        except OSError:
+            return self._blank_template.copy()
+
+        # Only decode the custom image again when it has been replaced
+        if self._custom_cache is None or self._custom_cache[0] != mtime:
+            logger.info("Load custom image")
+            image = self._blank_template.copy()
+            with Image.open(CUSTOM_IMAGE_PATH) as img:
+                image.paste(img, (0, 0))
+            self._custom_cache = (mtime, image)
+        return self._custom_cache[1]
 
     def _generate_home_view(self) -> Image.Image:
         """Generate the home view as an image.
@@ -126,38 +356,24 @@ class MAPIO_CTRL:
         Returns:
             Image: The home image
         """
-        # Add logo
-        img = Image.open(f"{Path(__file__).parent}/../images/mapio_logo_bw104x122.jpg")
-        image = Image.new("1", (self.epd.height, self.epd.width), 255)  # 255: clear the frame
-        image.paste(img, (2, 2))
+        # Start from the template holding the logo
+        image = self._home_template.copy()
 
         # Add hour
-        draw: Any = ImageDraw.Draw(image)
         clock = datetime.datetime.now().strftime("%H:%M")  # noqa
-        draw.text((120, 2), clock, 0, font=self.font40)
+        _paste_text(image, (120, 2), clock, 40)
 
         date = datetime.date.today()  # noqa
         date_formatee = date.strftime("%a %d/%m")
-        draw.text((120, 40), date_formatee, 0, font=self.font19)
+        _paste_text(image, (120, 40), date_formatee, 19)
 
         # Add version
-        try:
-            image_editable: Any = ImageDraw.Draw(image)
-            os_version = os.popen(
-                "cat /etc/os-release | grep MAPIO_OS_VERSION= | awk -F '=' '{print $2}'"  # noqa
-            ).read()
-        except:  # noqa: E722
-            os_version = "None"
-        image_editable.text((120, 105), f"MAPIO OS: {os_version}", 0, font=self.font12)  # type: ignore
+        os_version = _read_os_version()
+        _paste_text(image, (120, 105), f"MAPIO OS: {os_version}", 12)
 
         # Add IP address
-        try:
-            image_editable = ImageDraw.Draw(image)
-            def_gw_device = netifaces.gateways()["default"][netifaces.AF_INET][1]  # type: ignore
-            ip_addr = ni.ifaddresses(def_gw_device)[AF_INET][0]["addr"]  # type: ignore
-        except:  # noqa: E722
-            ip_addr = "NO IP"
-        image_editable.text((120, 90), ip_addr, 0, font=self.font12)  # type: ignore
+        ip_addr = self.ip_addr or "NO IP"
+        _paste_text(image, (120, 90), ip_addr, 12)
 
         return image
 
@@ -167,36 +383,22 @@ class MAPIO_CTRL:
         Returns:
             Image: The system image
         """
-        image = Image.new("1", (self.epd.height, self.epd.width), 255)
-        draw: Any = ImageDraw.Draw(image)
-        draw.text((0, 0), "System ", font=self.font28, fill=0)
-
-        draw.text((0, 30), f"•CPU: {psutil.cpu_percent()}%", font=self.font15, fill=0)
-        draw.text(
-            (115, 30),
-            f"•RAM: {psutil.virtual_memory().percent}%",
-            font=self.font15,
-            fill=0,
-        )
+        # Start from the template holding the title
+        image = self._system_template.copy()
+        metrics = self.system_metrics
 
-        draw.text(
-            (0, 50),
-            f"•eMMC: {psutil.disk_usage('/usr/local').percent}%",
-            font=self.font15,
-            fill=0,
-        )
-        uptime = os.popen("uptime | awk -F ',' '{print $1}' | cut -c14-").read()  # noqa
-        draw.text((115, 50), f"•Uptime: {uptime}", font=self.font15, fill=0)
+        _paste_text(image, (0, 30), f"•CPU: {metrics['cpu']}%", 15)
+        _paste_text(image, (115, 30), f"•RAM: {metrics['ram']}%", 15)
 
-        battery_volt, _ = self._get_battery_voltage()
-        draw.text((0, 70), f"•Battery: {battery_volt}V", font=self.font15, fill=0)
+        _paste_text(image, (0, 50), f"•eMMC: {metrics['emmc']}%", 15)
+        uptime = _read_uptime()
+        _paste_text(image, (115, 50), f"•Uptime: {uptime}", 15)
 
-        draw.text(
-            (0, 90),
-            f"•Temperature: {round(psutil.sensors_temperatures()['cpu_thermal'][0].current)}°C",
-            font=self.font15,
-            fill=0,
-        )
+        battery_volt, _ = self.battery
+        _paste_text(image, (0, 70), f"•Battery: {battery_volt}V", 15)
+
+        temperature = round(metrics["temperature"])
+        _paste_text(image, (0, 90), f"•Temperature: {temperature}°C", 15)
 
         return image
 
@@ -206,38 +408,37 @@ class MAPIO_CTRL:
         Returns:
             Image: The status image
         """
-        image = Image.new("1", (self.epd.height, self.epd.width), 255)
-        draw: Any = ImageDraw.Draw(image)
-        draw.line([(0, 40), (255, 40)])
-        draw.line([(0, 80), (255, 80)])
-        if os.system("systemctl is-active --quiet docker.service") == 0:  # noqa
-            draw.text((0, 90), "Docker    RUNNING", font=self.font15, fill=0)
+        # Start from the template holding the separator lines
+        image = self._status_template.copy()
+        if self.is_service_active("docker.service"):
+            _paste_text(image, (0, 90), "Docker    RUNNING", 15)
         else:
-            draw.text((0, 90), "Docker    STOPPED", font=self.font15, fill=0)
+            _paste_text(image, (0, 90), "Docker    STOPPED", 15)
 
-        if self._send_ping_command():
-            draw.text((0, 50), "Internet  CONNECTED", font=self.font15, fill=0)
+        if self.internet_connected:
+            _paste_text(image, (0, 50), "Internet  CONNECTED", 15)
         else:
-            draw.text((0, 50), "Internet  NOT CONNECTED", font=self.font15, fill=0)
+            _paste_text(image, (0, 50), "Internet  NOT CONNECTED", 15)
 
-        _, percent = self._get_battery_voltage()
-        if self.get_battery_state() == BatteryState.powered:
-            draw.text((0, 10), "POWERED: ", font=self.font15, fill=0)
+        _, percent = self.battery
+        battery_state = self.get_battery_state()
+        if battery_state is BatteryState.powered:
+            _paste_text(image, (0, 10), "POWERED: ", 15)
             offset = 100
-        elif self.get_battery_state() == BatteryState.on_battery:
-            draw.text((0, 10), "ON BATTERY: ", font=self.font15, fill=0)
+        elif battery_state is BatteryState.on_battery:
+            _paste_text(image, (0, 10), "ON BATTERY: ", 15)
             offset = 120
         else:
-            draw.text((0, 10), "CRITICAL BATTERY: ", font=self.font15, fill=0)
+            _paste_text(image, (0, 10), "CRITICAL BATTERY: ", 15)
             offset = 160
 
-        draw.text((offset, 5), "□□□", font=self.font28, fill=0)
+        _paste_text(image, (offset, 5), "□□□", 28)
         if percent == 100:
-            draw.text((offset, 5), "■■■", font=self.font28, fill=0)
+            _paste_text(image, (offset, 5), "■■■", 28)
         elif percent == 50:
-            draw.text((offset, 5), "■■□", font=self.font28, fill=0)
+            _paste_text(image, (offset, 5), "■■□", 28)
         elif percent == 25:
-            draw.text((offset, 5), "■□□", font=self.font28, fill=0)
+            _paste_text(image, (offset, 5), "■□□", 28)
 
         return image
 
@@ -247,145 +448,229 @@ class MAPIO_CTRL:
         Returns:
             Image: The status image
         """
-        image = Image.new("1", (self.epd.height, self.epd.width), 255)
+        image = self._blank_template.copy()
         draw: Any = ImageDraw.Draw(image)
 
-        try:
-            def_gw_device = netifaces.gateways()["default"][netifaces.AF_INET][1]  # type: ignore
-            ip_addr = ni.ifaddresses(def_gw_device)[AF_INET][0]["addr"]  # type: ignore
-        except:  # noqa: E722
-            ip_addr = "10.50.0.1"
+        ip_addr = self.ip_addr or "10.50.0.1"
         url = f"{ip_addr}"
 
-        if os.system("systemctl is-active --quiet mapio-webserver-back") == 0:  # noqa
-            draw.text((130, 0), f"{url}", font=self.font12, fill=0)
-            draw.text((0, 100), "Webserver is running", font=self.font12, fill=0)
-            draw.text((0, 110), "Press MID to disable server", font=self.font12, fill=0)
+        if self.is_service_active("mapio-webserver-back"):
+            _paste_text(image, (130, 0), f"{url}", 12)
+            _paste_text(image, (0, 100), "Webserver is running", 12)
+            _paste_text(image, (0, 110), "Press MID to disable server", 12)
 
             # Check if current connexion is ok
-            if not self._send_ping_command():
-                self._enable_access_point()
-                draw.text((0, 0), "WIFI AP ON", font=self.font12, fill=0)
-                text_layer = Image.new("1", (90, 30), 255)
-                draw_rot: Any = ImageDraw.Draw(text_layer)
-                draw_rot.text((0, 0), "SSID:MAPIO", font=self.font12, fill=0)
-                draw_rot.text((0, 15), f"PASS:{self.wifi_passwd}", font=self.font12, fill=0)
-                rotated_text_layer = text_layer.rotate(90.0, expand=True)
-                image.paste(rotated_text_layer, (85, 10))
+            if not self.internet_connected:
+                if self._enable_access_point():
+                    _paste_text(image, (0, 0), "WIFI AP ON", 12)
+                else:
+                    _paste_text(image, (0, 0), "WIFI AP STARTING", 12)
+                image.paste(_make_ap_label(self.wifi_passwd), (85, 10))
 
                 wifi_data = f"WIFI:S:MAPIO;T:WPA;P:{self.wifi_passwd};;"
-                addr_code: Any = qrcode.QRCode(  # type: ignore
-                    error_correction=qrcode.constants.ERROR_CORRECT_H, border=0  # type: ignore
-                )
-                addr_code.add_data(wifi_data)
-                qr_img = addr_code.make_image().resize((80, 80))
-                image.paste(qr_img, (0, 15))
+                image.paste(_make_qr(wifi_data), (0, 15))
             else:
-                draw.text((0, 0), "WIFI AP OFF", font=self.font12, fill=0)
-
-            addr_code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, border=0)  # type: ignore
-            addr_code.add_data(f"http://{url}")  # type: ignore
-            qr_img: Any = addr_code.make_image().resize((80, 80))  # type: ignore
-            image.paste(qr_img, (150, 15))
-
-            if self.mid_press:
-                self.mid_press = False
-                os.system("systemctl stop mapio-webserver-back")  # noqa
-                os.system("systemctl stop nginx")  # noqa
-                os.system("systemctl stop wpa_supplicant-ap")  # noqa
+                _paste_text(image, (0, 0), "WIFI AP OFF", 12)
+
+            image.paste(_make_qr(f"http://{url}"), (150, 15))
+
+            if self._take_mid_press():
+                # The access point is only useful to reach the webserver
+                services = (*WEBSERVER_SERVICES, "wpa_supplicant-ap")
+                subprocess.run(
+                    ["systemctl", "stop", *services],  # noqa: S603, S607
+                    check=False,
+                )
+                self.sample(self.sample_services)
                 #  Update the image
-                image = Image.new("1", (self.epd.height, self.epd.width), 255)
-                draw: Any = ImageDraw.Draw(image)
-                draw.text((30, 10), "Webserver is not running", font=self.font12, fill=0)
-                draw.text((30, 80), "Press MID to enable it", font=self.font12, fill=0)
+                draw.rectangle((0, 0, image.width, image.height), fill=255)
+                _paste_text(image, (30, 10), "Webserver is not running", 12)
+                _paste_text(image, (30, 80), "Press MID to enable it", 12)
 
         else:
-            draw.text((30, 10), "Webserver is not running", font=self.font12, fill=0)
-            draw.text((30, 80), "Press MID to enable it", font=self.font12, fill=0)
-
-            if self.mid_press:
-                self.mid_press = False
-                os.system("systemctl start mapio-webserver-back")  # noqa
-                os.system("systemctl start nginx")  # noqa
-                image = Image.new("1", (self.epd.height, self.epd.width), 255)
-                draw: Any = ImageDraw.Draw(image)
-                draw.text((30, 10), "Webserver is starting", font=self.font12, fill=0)
-                draw.text((30, 80), "Please wait ...", font=self.font12, fill=0)
-                mapio_ctrl.need_refresh = True
+            _paste_text(image, (30, 10), "Webserver is not running", 12)
+            _paste_text(image, (30, 80), "Press MID to enable it", 12)
+
+            if self._take_mid_press():
+                subprocess.run(
+                    ["systemctl", "start", *WEBSERVER_SERVICES],  # noqa: S603, S607
+                    check=False,
+                )
+                self.sample(self.sample_services)
+                draw.rectangle((0, 0, image.width, image.height), fill=255)
+                _paste_text(image, (30, 10), "Webserver is starting", 12)
+                _paste_text(image, (30, 80), "Please wait ...", 12)
+                self.request_refresh()
 
         return image
 
-    def _send_ping_command(self) -> bool:
-        """Send a ping command to test internet connection.
+    def request_refresh(self) -> None:
+        """Ask the refresh screen task to refresh the screen now."""
+        self.refresh_event.set()
+
+    def request_leds_update(self) -> None:
+        """Ask the refresh leds task to apply the LEDs state again now."""
+        self.leds_event.set()
+
+    def is_service_active(self, service: str) -> bool:
+        """Check if a monitored service is active.
+
+        Args:
+            service (str): Service name, must be part of MONITORED_SERVICES
 
         Returns:
-            bool: True if ping is successful, False otherwise
+            bool: True if the service is active, False otherwise
         """
-        command = ["ping", "-c", "1", "-W", "1", "8.8.8.8"]
-        if subprocess.call(command) == 0:  # noqa
-            return True
+        return self.services.get(service, False)
 
-        return False
+    @staticmethod
+    def sample(sampler: Callable[[], None]) -> None:
+        """Run a sampler, the previous sampled value is kept if it fails.
+
+        Args:
+            sampler (Callable[[], None]): The sample method to run
+        """
+        try:
+            sampler()
+        except Exception:
+            logger.exception(f"{sampler.__name__} failed, keep the previous value")
+
+    def sample_services(self) -> None:
+        """Query the state of all MONITORED_SERVICES with a single systemctl call."""
+        result = subprocess.run(
+            ["systemctl", "is-active", *MONITORED_SERVICES],  # noqa: S603, S607
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        # systemctl prints one state per line, in the same order as the services
+        states = result.stdout.splitlines()
+        self.services = {name: state == "active" for name, state in zip(MONITORED_SERVICES, states)}
+
+    def sample_ip_addr(self) -> None:
+        """Get the IP address of the default gateway interface, if there is a default route."""
+        try:
+            def_gw_device = netifaces.gateways()["default"][netifaces.AF_INET][1]  # type: ignore
+            self.ip_addr = ni.ifaddresses(def_gw_device)[AF_INET][0]["addr"]  # type: ignore
+        except:  # noqa: E722
+            self.ip_addr = None
+
+    def sample_internet(self) -> None:
+        """Test internet connection."""
+        try:
+            with socket.create_connection(INTERNET_CHECK_ADDRESS, timeout=INTERNET_CHECK_TIMEOUT_S):
+                self.internet_connected = True
+        except OSError:
+            self.internet_connected = False
+
+    def sample_system_metrics(self) -> None:
+        """Sample the system metrics shown in the system view.
 
-    def _enable_access_point(self) -> None:
+        The CPU usage is measured since the previous sample without blocking.
+        The metrics are replaced as a whole so that readers never see a
+        partial update.
+        """
+        self.system_metrics = {
+            "cpu": psutil.cpu_percent(interval=None),
+            "ram": psutil.virtual_memory().percent,
+            "emmc": psutil.disk_usage("/usr/local").percent,
+            # Millidegrees Celsius, read directly instead of enumerating all sensors
+            "temperature": int(CPU_TEMPERATURE_PATH.read_text()) / 1000,
+        }
+
+    def _enable_access_point(self) -> bool:
         """Enable the WIFI access point with dynamic password.
 
-        If the access point was already active, this function does
-        nothing.
+        The access point is configured and restarted in the background, the
+        screen is refreshed once it is done. If the access point was already
+        active or is being enabled, this function does nothing.
+
+        Returns:
+            bool: True if the access point is active, False if it is starting
         """
-        if os.system("systemctl is-active wpa_supplicant-ap") == 0:  # noqa
+        if self._ap_future is not None and not self._ap_future.done():
+            logger.debug("Access point WIFI is starting")
+            return False
+        if self.is_service_active("wpa_supplicant-ap"):
             logger.debug("Access point WIFI is already active")
-        else:
-            logger.info("Enable WIFI access point")
-            # Generate a random wifi password
-            self.wifi_passwd = "".join(
-                random.choice(string.ascii_lowercase) for _ in range(8)  # noqa
-            )
-            sed_arg = f's/psk=.*/psk="{self.wifi_passwd}"/g'
-            # Replace the password in current access point configuration
-            command = [
-                "sed",
-                "-i",
-                sed_arg,
-                "/etc/wpa_supplicant/wpa_supplicant-ap.conf",
-            ]
-            subprocess.call(command)  # noqa
-            os.system("systemctl stop wpa_supplicant@wlan0")  # noqa
-            os.system("systemctl restart wpa_supplicant-ap")  # noqa
-
-    def _get_battery_voltage(self) -> tuple[float, int]:
-        # Get PMIC model
-        model = os.popen("vcgencmd pmicrd 0 | awk '{print $3}'").read()  # noqa
-        if model.strip() == "a0":
+            return True
+
+        logger.info("Enable WIFI access point")
+        # Generate a random wifi password, 8 characters that need no escaping in sed or QR code
+        self.wifi_passwd = secrets.token_urlsafe(6)
+        self._ap_future = self._ap_executor.submit(self._configure_access_point, self.wifi_passwd)
+        self._ap_future.add_done_callback(lambda _: self.request_refresh())
+        return False
+
+    def _configure_access_point(self, wifi_passwd: str) -> None:
+        """Set the access point password and restart it.
+
+        Args:
+            wifi_passwd (str): The access point password
+        """
+        sed_arg = f's/psk=.*/psk="{wifi_passwd}"/g'
+        # Replace the password in current access point configuration
+        command = [
+            "sed",
+            "-i",
+            sed_arg,
+            "/etc/wpa_supplicant/wpa_supplicant-ap.conf",
+        ]
+        subprocess.run(command, check=False)  # noqa: S603
+        subprocess.run(
+            ["systemctl", "stop", "wpa_supplicant@wlan0"],  # noqa: S603, S607
+            check=False,
+        )
+        subprocess.run(
+            ["systemctl", "restart", "wpa_supplicant-ap"],  # noqa: S603, S607
+            check=False,
+        )
+        self.sample(self.sample_services)
+
+    @staticmethod
+    def _read_pmic_register(register: str) -> int:
+        """Read a PMIC register through vcgencmd.
+
+        Args:
+            register (str): The register address, as expected by vcgencmd
+
+        Returns:
+            int: The register value
+        """
+        result = subprocess.run(
+            ["vcgencmd", "pmicrd", register],  # noqa: S603, S607
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        # Register value is the third field of vcgencmd output
+        return int(result.stdout.split()[2], 16)
+
+    @cached_property
+    def _pmic_model(self) -> int:
+        """PMIC model, it never changes at runtime so it is only read once."""
+        return self._read_pmic_register("0")
+
+    def sample_battery(self) -> None:
+        """Read the battery voltage from the PMIC and update its percent."""
+        if self._pmic_model == 0xA0:
             # MAX LINEAR MXL7704
             # Read AIN0 value
-            battery_volt = os.popen("vcgencmd pmicrd 1d | awk '{print $3}'").read()  # noqa
-            battery_volt_float = 2 * int(battery_volt, 16) / 100
+            battery_volt_float = 2 * self._read_pmic_register("1d") / 100
         else:
             # DA9090 PMIC
             # Read AIN0 value
-            battery_volt = os.popen("vcgencmd pmicrd 0x13 | awk '{print $3}'").read()  # noqa
-            battery_volt_float = 4 * int(battery_volt, 16) / 100
+            battery_volt_float = 4 * self._read_pmic_register("0x13") / 100
 
-        percent = 0
-        if battery_volt_float > 3.75:
-            percent = 100
-        elif battery_volt_float > 3.4:
-            percent = 50
-        elif battery_volt_float > 3.25:
-            percent = 25
-
-        return battery_volt_float, percent
+        self.battery = (battery_volt_float, battery_percent(battery_volt_float))
 
     def get_battery_state(self) -> BatteryState:
         """Return the current battery state."""
         state: BatteryState
-        chg_boost_n = os.popen("gpioget --numeric -c 2 10").read().strip()  # noqa
-
-        if chg_boost_n == "0":
+        if self.chg_boost_n_gpio.get_value() == 0:
             state = BatteryState.on_battery
         else:
-            _, percent = self._get_battery_voltage()
+            _, percent = self.battery
             if percent <= 25:
                 state = BatteryState.critical
             else:
@@ -401,125 +686,211 @@ mapio_ctrl = MAPIO_CTRL()
 
 def refresh_screen_task() -> None:
     """Task that refresh the epaper screen."""
-    next_refresh_time = round(time.time())
+    next_refresh_time = time.monotonic()
     logger.info("Start refresh screen task")
-    prev_hash = 0
+    prev_image_array = None
+    partial_refresh_count = 0
+    fast_refresh_count = 0
+    linewidth = mapio_ctrl.epd.linewidth
 
     while True:
-        if (next_refresh_time + SCREEN_REFRESH_PERIOD_S < round(time.time())) or (
-            mapio_ctrl.need_refresh is True
-        ):
-            mapio_ctrl.epd.init()
+        # Sleep until the next periodic refresh, unless a refresh is requested before
+        timeout = next_refresh_time + SCREEN_REFRESH_PERIOD_S - time.monotonic()
+        requested = mapio_ctrl.refresh_event.wait(max(timeout, 0))
+        mapio_ctrl.refresh_event.clear()
+        # Let fast button presses settle so that only the last selected view is rendered
+        while requested and mapio_ctrl.refresh_event.wait(REFRESH_SETTLE_S):
+            mapio_ctrl.refresh_event.clear()
+
+        next_refresh_time = time.monotonic()
+        # Update view for next refresh
+        mapio_ctrl.current_view = mapio_ctrl.selected_view
+        # The frame is rendered from sampled state before waking the controller up,
+        # which is only done when the frame changed
+        image_array = mapio_ctrl.get_current_buffered_image()
+        # Comparing raw buffers is cheaper than hashing them
+        if image_array != prev_image_array:
+            logger.info("Refresh the screen")
             mapio_ctrl.epd.is_busy = True
-            next_refresh_time = round(time.time())
-            mapio_ctrl.need_refresh = False
-            # Update view for next refresh
-            mapio_ctrl.current_view = mapio_ctrl.views_pool[0]
-            image_array = mapio_ctrl.get_current_buffered_image()
-            hash_function = hashlib.sha256()
-            hash_function.update(image_array)
-            new_hash = hash_function.hexdigest()
-            logger.info(f"Image hash is {new_hash}")
-            if new_hash != prev_hash:
-                logger.info("Refresh the screen")
-                mapio_ctrl.led_sys_green.blink(True)
-                prev_hash = new_hash
-                if mapio_ctrl.epd.display(image_array) is False:
-                    mapio_ctrl.need_refresh = True
-                    prev_hash = 0
+            mapio_ctrl.epd.init()
+            mapio_ctrl.led_sys_green.blink(True)
+            use_partial = False
+            if prev_image_array is not None and partial_refresh_count < PARTIAL_REFRESH_LIMIT:
+                bbox = bbox_diff(image_array, prev_image_array, linewidth)
+                if bbox is not None:
+                    x_start, y_start, x_end, y_end = bbox
+                    changed_area = (x_end - x_start + 1) * (y_end - y_start + 1)
+                    use_partial = changed_area <= PARTIAL_REFRESH_MAX_AREA * len(image_array)
+            if use_partial:
+                # Only a small part of the screen changed, use a partial refresh
+                is_ok = mapio_ctrl.epd.display_partial(image_array, prev_image_array)
+                partial_refresh_count += 1
+            elif prev_image_array is not None and fast_refresh_count < FAST_REFRESH_LIMIT:
+                mapio_ctrl.epd.set_fast_waveform()
+                is_ok = mapio_ctrl.epd.display_fast(image_array)
+                partial_refresh_count = 0
+                fast_refresh_count += 1
             else:
-                mapio_ctrl.epd.is_busy = False
-                logger.info("No need to refresh")
-
-        time.sleep(0.5)
+                is_ok = mapio_ctrl.epd.display(image_array)
+                partial_refresh_count = 0
+                fast_refresh_count = 0
+            mapio_ctrl.epd.is_busy = False
+            prev_image_array = image_array
+            if is_ok is False:
+                mapio_ctrl.request_refresh()
+                prev_image_array = None
+        else:
+            logger.info("No need to refresh")
+        # The system LED was blinking during the refresh
+        mapio_ctrl.request_leds_update()
 
 
 def refresh_leds_task() -> None:
-    """Task that refresh the leds."""
+    """Task that refresh the leds.
+
+    LEDs are only written when the state they show changes, or when another
+    task drove them in the meantime.
+    """
     logger.info("Start refresh leds task")
+    last_docker_active: Optional[bool] = None
+    last_battery_state: Optional[BatteryState] = None
 
     while True:
         # LED1 management
         # Check if docker service is running
         if mapio_ctrl.epd.is_busy:
-            pass
-        elif os.system("systemctl is-active --quiet docker.service") == 0:  # noqa
-            mapio_ctrl.led_sys_green.blink(False)
-            mapio_ctrl.led_sys_green.on()
-            mapio_ctrl.led_sys_red.off()
+            # The refresh screen task blinks the LED, apply the state once it is done
+            last_docker_active = None
         else:
-            mapio_ctrl.led_sys_green.blink(False)
-            mapio_ctrl.led_sys_green.on()
-            mapio_ctrl.led_sys_red.on()
+            docker_active = mapio_ctrl.is_service_active("docker.service")
+            if docker_active != last_docker_active:
+                mapio_ctrl.led_sys_green.blink(False)
+                mapio_ctrl.led_sys_green.on()
+                if docker_active:
+                    mapio_ctrl.led_sys_red.off()
+                else:
+                    mapio_ctrl.led_sys_red.on()
+                last_docker_active = docker_active
 
         # LED3 management
-        if mapio_ctrl.get_battery_state() == BatteryState.powered:
-            logger.debug("Powered")
-            mapio_ctrl.led_chg_red.off()
-            mapio_ctrl.led_chg_green.on()
-        elif mapio_ctrl.get_battery_state() == BatteryState.on_battery:
-            logger.debug("On Battery")
-            mapio_ctrl.led_chg_green.off()
-            mapio_ctrl.led_chg_red.off()
-            mapio_ctrl.led_chg_green.on()
-            mapio_ctrl.led_chg_red.on()
-        elif mapio_ctrl.get_battery_state() == BatteryState.critical:
-            logger.debug("Crititcal Battery")
-            mapio_ctrl.led_chg_red.on()
-            mapio_ctrl.led_chg_green.off()
-        time.sleep(1)
-
-
-def _gpio_chip_handler(buttons: Any) -> None:
+        battery_state = mapio_ctrl.get_battery_state()
+        if battery_state != last_battery_state:
+            if battery_state is BatteryState.powered:
+                logger.debug("Powered")
+                mapio_ctrl.led_chg_red.off()
+                mapio_ctrl.led_chg_green.on()
+            elif battery_state is BatteryState.on_battery:
+                logger.debug("On Battery")
+                mapio_ctrl.led_chg_green.on()
+                mapio_ctrl.led_chg_red.on()
+            elif battery_state is BatteryState.critical:
+                logger.debug("Crititcal Battery")
+                mapio_ctrl.led_chg_red.on()
+                mapio_ctrl.led_chg_green.off()
+            last_battery_state = battery_state
+
+        if mapio_ctrl.leds_event.wait(LEDS_REFRESH_PERIOD_S):
+            mapio_ctrl.leds_event.clear()
+            last_docker_active = None
+
+
+def sample_system_task() -> None:
+    """Task that samples the system state shown by the views and the LEDs."""
+    logger.info("Start sample system task")
+    next_ip_time = time.monotonic() + IP_SAMPLE_PERIOD_S
+    next_internet_time = time.monotonic() + INTERNET_SAMPLE_PERIOD_S
+
+    while True:
+        time.sleep(SYSTEM_SAMPLE_PERIOD_S)
+        mapio_ctrl.sample(mapio_ctrl.sample_system_metrics)
+        mapio_ctrl.sample(mapio_ctrl.sample_battery)
+        mapio_ctrl.sample(mapio_ctrl.sample_services)
+        if time.monotonic() >= next_ip_time:
+            mapio_ctrl.sample(mapio_ctrl.sample_ip_addr)
+            next_ip_time = time.monotonic() + IP_SAMPLE_PERIOD_S
+        # A connection check can block up to INTERNET_CHECK_TIMEOUT_S, do it less often
+        if time.monotonic() >= next_internet_time:
+            mapio_ctrl.sample(mapio_ctrl.sample_internet)
+            next_internet_time = time.monotonic() + INTERNET_SAMPLE_PERIOD_S
+
+
+def _mid_button_handler(button: Any) -> None:
+    """Handle a MID button press, a press held for 3 seconds reboots the board.
+
+    Args:
+        button (Any): The MID button GPIO
+    """
+    long_pressed = True
+    for _ in range(30):
+        if button.get_value() != 0:
+            long_pressed = False
+            break
+        time.sleep(0.1)
+    if long_pressed:
+        logger.info("Long pressed detected, ask for reboot")
+        mapio_ctrl.led_sys_green.off()
+        mapio_ctrl.led_sys_red.on()
+        subprocess.run(["reboot"], check=False)  # noqa: S603, S607
+
+    with mapio_ctrl.state_lock:
+        mapio_ctrl.mid_press = True
+        mapio_ctrl.request_refresh()
+    mapio_ctrl.led_sys_green.blink(True)
+
+
+def _gpio_buttons_handler(buttons: list[Any]) -> None:
     """Handler for GPIO buttons interrupts.
 
+    A single handler waits on the event file descriptors of all the buttons,
+    whatever their GPIO chip. A MID press is handled in a short-lived thread
+    because detecting a long press takes up to 3 seconds. State shared with the
+    refresh screen task is updated under mapio_ctrl.state_lock.
+
     Args:
-        buttons (Any): List of GPIO that trigs the interrupt
+        buttons (list[Any]): List of GPIO that trigs the interrupt
     """
-    last_event_time = time.time()
+    selector = selectors.DefaultSelector()
+    for button in buttons:
+        selector.register(button.event_get_fd(), selectors.EVENT_READ, button)
+
+    # Time of the last accepted event, by button
+    last_event_times: dict[str, float] = {}
+    # Thread handling the last MID press
+    mid_thread: Optional[threading.Thread] = None
     while True:
-        lines = buttons.event_wait(datetime.timedelta(seconds=10))
-        if not lines.empty:
-            for it in lines:
-                event = it.event_read()
-                current_time = time.time()
-                if current_time - last_event_time > 3:
-                    last_event_time = current_time
-                    logger.debug(f"Event: {event}")
-                    if mapio_ctrl.epd.is_busy:
-                        logger.info("ePaper is busy, ignore button event")
-                    elif it.consumer == "UP":
-                        mapio_ctrl.need_refresh = True
-                        mapio_ctrl.views_pool.rotate(-1)
-                        mapio_ctrl.led_sys_green.blink(True)
-                        logger.info(f"next view is: {mapio_ctrl.views_pool[0]}")
-                    elif it.consumer == "DOWN":
-                        mapio_ctrl.need_refresh = True
-                        mapio_ctrl.views_pool.rotate(1)
-                        mapio_ctrl.led_sys_green.blink(True)
-                        logger.info(f"next view is: {mapio_ctrl.views_pool[0]}")
-                    elif it.consumer == "MID":
-                        logger.info("MID has been pushed")
-                        long_pressed = True
-                        for _ in range(30):
-                            if it.get_value() != 0:
-                                long_pressed = False
-                                break
-                            time.sleep(0.1)
-                        if long_pressed:
-                            logger.info("Long pressed detected, ask for reboot")
-                            mapio_ctrl.led_sys_green.off()
-                            mapio_ctrl.led_sys_red.on()
-                            os.system("reboot")  # noqa
-
-                        mapio_ctrl.need_refresh = True
-                        mapio_ctrl.mid_press = True
-                        mapio_ctrl.led_sys_green.blink(True)
-                    else:
-                        logger.error("Unknown button")
+        for key, _ in selector.select():
+            it = key.data
+            # Drain the bounces queued for this button, they count as a single press
+            events = read_events(it)
+            current_time = time.monotonic()
+            last_event_time = last_event_times.get(it.consumer)
+            if last_event_time is None or current_time - last_event_time > BUTTON_DEBOUNCE_S:
+                last_event_times[it.consumer] = current_time
+                logger.debug(f"Events: {events}")
+                if mapio_ctrl.epd.is_busy:
+                    logger.info("ePaper is busy, ignore button event")
+                elif it.consumer == "UP":
+                    with mapio_ctrl.state_lock:
+                        view = mapio_ctrl.rotate_view(1)
+                        mapio_ctrl.request_refresh()
+                    mapio_ctrl.led_sys_green.blink(True)
+                    logger.info(f"next view is: {view.name}")
+                elif it.consumer == "DOWN":
+                    with mapio_ctrl.state_lock:
+                        view = mapio_ctrl.rotate_view(-1)
+                        mapio_ctrl.request_refresh()
+                    mapio_ctrl.led_sys_green.blink(True)
+                    logger.info(f"next view is: {view.name}")
+                elif it.consumer == "MID":
+                    logger.info("MID has been pushed")
+                    # Waiting for a long press would block the other buttons
+                    if mid_thread is None or not mid_thread.is_alive():
+                        mid_thread = threading.Thread(target=_mid_button_handler, args=(it,))
+                        mid_thread.start()
                 else:
-                    logger.info("Debounce : ignore button event")
-        time.sleep(1)
+                    logger.error("Unknown button")
+            else:
+                logger.info("Debounce : ignore button event")
 
 
 def gpio_mon_create_task() -> None:
@@ -528,19 +899,17 @@ def gpio_mon_create_task() -> None:
     # Button mid on chip 0
     config = line_request()
     config.request_type = line_request.EVENT_FALLING_EDGE
-    chip0 = chip(0)
+    chip0 = get_chip(0)
     BUTTON_MID_LINE_OFFSETS = [18]
     buttons_mid = chip0.get_lines(BUTTON_MID_LINE_OFFSETS)
     for i in range(buttons_mid.size):
         config.consumer = "MID"
         buttons_mid[i].request(config)
-    event = threading.Thread(target=_gpio_chip_handler, args=(buttons_mid,))
-    event.start()
 
     # Button up and down on chip 1
     config = line_request()
     config.request_type = line_request.EVENT_FALLING_EDGE
-    chip1 = chip(2)
+    chip1 = get_chip(2)
     BUTTON_UP_DOWN_LINE_OFFSETS = [0, 1]
     buttons_up_down = chip1.get_lines(BUTTON_UP_DOWN_LINE_OFFSETS)
     for i in range(buttons_up_down.size):
@@ -549,5 +918,8 @@ def gpio_mon_create_task() -> None:
         else:
             config.consumer = "UP"
         buttons_up_down[i].request(config)
-    event = threading.Thread(target=_gpio_chip_handler, args=(buttons_up_down,))
+
+    buttons = [buttons_mid[i] for i in range(buttons_mid.size)]
+    buttons += [buttons_up_down[i] for i in range(buttons_up_down.size)]
+    event = threading.Thread(target=_gpio_buttons_handler, args=(buttons,))
     event.start()
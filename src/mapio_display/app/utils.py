@@ -0,0 +1,73 @@
+"""MAPIO display helpers, independent from the hardware."""
+
+import bisect
+from typing import Any, Optional
+
+# Battery percent shown above each voltage threshold
+BATTERY_VOLTAGE_THRESHOLDS = (3.25, 3.4, 3.75)
+BATTERY_PERCENTS = (0, 25, 50, 100)
+
+
+def battery_percent(voltage: float) -> int:
+    """Get the battery percent shown for a battery voltage.
+
+    Args:
+        voltage (float): Battery voltage in V
+
+    Returns:
+        int: The battery percent, one of BATTERY_PERCENTS
+    """
+    # Number of thresholds strictly below the voltage
+    level = bisect.bisect_left(BATTERY_VOLTAGE_THRESHOLDS, voltage)
+    return BATTERY_PERCENTS[level]
+
+
+def format_uptime(seconds: int) -> str:
+    """Format an uptime like the uptime command.
+
+    Args:
+        seconds (int): Uptime in seconds
+
+    Returns:
+        str: The formatted uptime ("3 days", "2:03" or "5 min")
+    """
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes = seconds // 60
+    if days:
+        return f"{days} day{'s' if days > 1 else ''}"
+    if hours:
+        return f"{hours}:{minutes:02d}"
+    return f"{minutes} min"
+
+
+def bbox_diff(new: Any, old: Any, linewidth: int) -> Optional[tuple[int, int, int, int]]:
+    """Get the bounding box of the differences between two screen buffers.
+
+    Args:
+        new (Any): New screen buffer
+        old (Any): Previous screen buffer
+        linewidth (int): Number of bytes per row
+
+    Returns:
+        Optional[tuple[int, int, int, int]]: First column byte, first row, last column byte
+            and last row that differ (inclusive), None if buffers are identical
+    """
+    # Rows are compared as whole slices, which is done in C
+    rows = [
+        y
+        for y in range(len(new) // linewidth)
+        if new[y * linewidth : (y + 1) * linewidth] != old[y * linewidth : (y + 1) * linewidth]
+    ]
+    if not rows:
+        return None
+
+    # Merge the differences of all changed rows in a single integer, one byte per column:
+    # highest set bit gives the first changed column, lowest set bit the last one
+    mask = 0
+    for y in rows:
+        row = slice(y * linewidth, (y + 1) * linewidth)
+        mask |= int.from_bytes(new[row], "big") ^ int.from_bytes(old[row], "big")
+    x_start = linewidth - 1 - (mask.bit_length() - 1) // 8
+    x_end = linewidth - 1 - ((mask & -mask).bit_length() - 1) // 8
+    return x_start, rows[0], x_end, rows[-1]
@@ -14,6 +14,7 @@ from mapio_display.app.app import (
     mapio_ctrl,
     refresh_leds_task,
     refresh_screen_task,
+    sample_system_task,
 )
 
 # Local package imports
@@ -52,6 +53,9 @@ def app() -> None:
     event = threading.Thread(target=refresh_leds_task)
     event.start()
 
+    event = threading.Thread(target=sample_system_task)
+    event.start()
+
     gpio_mon_create_task()
 
     while True:
@@ -1,18 +1,33 @@
-"""MAPIO epaper control."""
+"""MAPIO epaper control.
+
+Frames of height * linewidth bytes (4000 bytes) are sent with a single writebytes2
+call, which splits them in chunks of the spidev buffer size. With bufsiz
+(/sys/module/spidev/parameters/bufsiz, 4096 by default) of at least 4000 bytes, each
+frame goes in a single transfer (one DMA).
+"""
 
 #!/usr/bin/python
+import datetime
 import time
-from typing import Any
+from typing import Any, Optional
 
 import gpiod  # type: ignore
 import spidev  # type: ignore
 from loguru import logger
 from PIL import Image  # type: ignore
 
+from mapio_display.gpio.gpio import get_chip, read_events
+
 # Display resolution
 EPD_WIDTH = 122
 EPD_HEIGHT = 250
 
+# SPI clock, half the SSD1680 20 MHz write limit to keep a margin on the board wiring
+SPI_SPEED_HZ = 10000000
+
+# Maximum time to wait for the controller to become ready
+BUSY_TIMEOUT_S = 6
+
 # Pin definition
 RST_PIN = 13
 DC_PIN = 14
@@ -35,11 +50,15 @@ class EPD:
         """Initialise epaper."""
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
+        # Bytes per RAM row, rows are padded to a whole byte: 16 for a width of 122
+        self.linewidth = (self.width + 7) // 8
         self.spi: Any = spidev.SpiDev()  # type: ignore
         self.spi.open(0, 0)
-        self.spi.max_speed_hz = 4000000
+        self.spi.max_speed_hz = SPI_SPEED_HZ
+        # SSD1680 samples data on SCLK rising edge, clock idle low
+        self.spi.mode = 0
 
-        chip = gpiod.chip(2)
+        chip = get_chip(2)
         config = gpiod.line_request()
         config.request_type = gpiod.line_request.DIRECTION_OUTPUT
 
@@ -47,11 +66,16 @@ class EPD:
         self.dc_gpio = chip.get_line(DC_PIN)
         self.reset_gpio.request(config)
         self.dc_gpio.request(config)
+        # Last value driven on DC, unknown until first set
+        self._dc_value: Optional[int] = None
 
-        config.request_type = gpiod.line_request.DIRECTION_INPUT
+        # BUSY goes low when the controller is ready, wait for it with edge events
+        config.request_type = gpiod.line_request.EVENT_FALLING_EDGE
         self.busy_gpio = chip.get_line(BUSY_PIN)
         self.busy_gpio.request(config)
         self.is_busy = False
+        # Reused to send single bytes without building a list each time
+        self._byte_buffer = bytearray(1)
         logger.info("EPD initialized")
 
     def spi_transfer(self, data: Any) -> None:
@@ -62,6 +86,16 @@ class EPD:
         """
         self.spi.writebytes2(data)
 
+    def set_dc(self, value: int) -> None:
+        """Drive the DC pin, only when its value changes.
+
+        Args:
+            value (int): 0 for a command, 1 for data
+        """
+        if value != self._dc_value:
+            self.dc_gpio.set_value(value)
+            self._dc_value = value
+
     def reset(self) -> None:
         """Reset EPD."""
         self.reset_gpio.set_value(1)
@@ -71,14 +105,19 @@ class EPD:
         self.reset_gpio.set_value(1)
         epd_delay_ms(20)
 
-    def send_command(self, command: Any) -> None:
-        """Send a command on EPD.
+    def send_command(self, command: Any, *data: int) -> None:
+        """Send a command on EPD, followed by its data bytes in a single transfer.
 
         Args:
             command (Any): Send a command on EPD (see EPD datasheet for more details)
+            data (int): Data bytes of the command
         """
-        self.dc_gpio.set_value(0)
-        self.spi_transfer([command])
+        self.set_dc(0)
+        self._byte_buffer[0] = command
+        self.spi_transfer(self._byte_buffer)
+        if data:
+            self.set_dc(1)
+            self.spi_transfer(bytes(data))
 
     def send_data(self, data: Any) -> None:
         """Send data on EPD.
@@ -86,8 +125,9 @@ class EPD:
         Args:
             data (Any): Send data on EPD (see EPD datasheet for more details)
         """
-        self.dc_gpio.set_value(1)
-        self.spi_transfer([data])
+        self.set_dc(1)
+        self._byte_buffer[0] = data
+        self.spi_transfer(self._byte_buffer)
 
     # send a lot of data
     def send_data2(self, data: Any) -> None:
@@ -96,25 +136,43 @@ class EPD:
         Args:
             data (Any): Send a raw data on EPD (see EPD datasheet for more details)
         """
-        self.dc_gpio.set_value(1)
+        self.set_dc(1)
         self.spi_transfer(data)
 
     def wait_busy(self) -> bool:
-        """Wait EPD ready state."""
-        start_time = time.time()
+        """Wait EPD ready state.
+
+        Returns:
+            bool: True if the EPD is ready, False on timeout
+        """
+        deadline = time.monotonic() + BUSY_TIMEOUT_S
 
+        # Events queued by previous busy phases may be stale, the pin value is checked
+        # again after each wakeup, including the one at the deadline
         while self.busy_gpio.get_value() == 1:  # 0: idle, 1: busy
-            if time.time() - start_time > 6:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 logger.error("Timeout occurred while waiting for e-Paper to become ready")
                 return False
-            epd_delay_ms(10)
-        self.is_busy = False
+            if self.busy_gpio.event_wait(datetime.timedelta(seconds=remaining)):
+                read_events(self.busy_gpio)
         return True
 
     def turn_on_display(self) -> bool:
         """Turn ON EPD."""
-        self.send_command(0x22)  # Display Update Control
-        self.send_data(0xF7)
+        self.send_command(0x22, 0xF7)  # Display Update Control
+        self.send_command(0x20)  # Activate Display Update Sequence
+        return self.wait_busy()
+
+    def turn_on_display_fast(self) -> bool:
+        """Turn ON EPD with the waveform loaded by set_fast_waveform."""
+        self.send_command(0x22, 0xC7)  # Display Update Control
+        self.send_command(0x20)  # Activate Display Update Sequence
+        return self.wait_busy()
+
+    def turn_on_display_part(self) -> bool:
+        """Turn ON EPD with the partial refresh waveform."""
+        self.send_command(0x22, 0xFF)  # Display Update Control
         self.send_command(0x20)  # Activate Display Update Sequence
         return self.wait_busy()
 
@@ -127,16 +185,14 @@ class EPD:
             x_end (int): _description_
             y_end (int): _description_
         """
-        self.send_command(0x44)  # SET_RAM_X_ADDRESS_START_END_POSITION
+        # SET_RAM_X_ADDRESS_START_END_POSITION
         # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data((x_start >> 3) & 0xFF)
-        self.send_data((x_end >> 3) & 0xFF)
+        self.send_command(0x44, (x_start >> 3) & 0xFF, (x_end >> 3) & 0xFF)
 
-        self.send_command(0x45)  # SET_RAM_Y_ADDRESS_START_END_POSITION
-        self.send_data(y_start & 0xFF)
-        self.send_data((y_start >> 8) & 0xFF)
-        self.send_data(y_end & 0xFF)
-        self.send_data((y_end >> 8) & 0xFF)
+        # SET_RAM_Y_ADDRESS_START_END_POSITION
+        self.send_command(
+            0x45, y_start & 0xFF, (y_start >> 8) & 0xFF, y_end & 0xFF, (y_end >> 8) & 0xFF
+        )
 
     def SetCursor(self, x: int, y: int) -> None:
         """SetCursor on the screen.
@@ -145,13 +201,10 @@ class EPD:
             x (int): X-axis starting position
             y (int): Y-axis starting position
         """
-        self.send_command(0x4E)  # SET_RAM_X_ADDRESS_COUNTER
         # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data(x & 0xFF)
+        self.send_command(0x4E, x & 0xFF)  # SET_RAM_X_ADDRESS_COUNTER
 
-        self.send_command(0x4F)  # SET_RAM_Y_ADDRESS_COUNTER
-        self.send_data(y & 0xFF)
-        self.send_data((y >> 8) & 0xFF)
+        self.send_command(0x4F, y & 0xFF, (y >> 8) & 0xFF)  # SET_RAM_Y_ADDRESS_COUNTER
 
     def init(self) -> None:
         """Initialize the e-Paper register."""
@@ -162,26 +215,35 @@ class EPD:
         self.send_command(0x12)  # SWRESET
         epd_delay_ms(10)
 
-        self.send_command(0x01)  # Driver output control
-        self.send_data(0xF9)
-        self.send_data(0x00)
-        self.send_data(0x00)
+        self.send_command(0x01, 0xF9, 0x00, 0x00)  # Driver output control
 
-        self.send_command(0x11)  # data entry mode Source from S8 to S167
-        self.send_data(0x03)
+        self.send_command(0x11, 0x03)  # data entry mode Source from S8 to S167
 
         self.set_window(0, 0, self.width - 1, self.height - 1)
 
-        self.send_command(0x3C)
-        self.send_data(0x05)
+        self.send_command(0x3C, 0x05)
+
+        self.send_command(0x18, 0x80)
 
-        self.send_command(0x18)
-        self.send_data(0x80)
+        self.send_command(0x21, 0x00, 0x80)  # Normal RAM,
+
+        self.wait_busy()
+
+    def set_fast_waveform(self) -> None:
+        """Load the fast full refresh waveform, must be called after init.
+
+        The controller is given a high temperature, for which its OTP holds a
+        shorter waveform. Pixels are driven less, so a normal full refresh
+        must be done from time to time.
+        """
+        self.send_command(0x22, 0xB1)  # Load temperature value
+        self.send_command(0x20)
+        self.wait_busy()
 
-        self.send_command(0x21)  # Normal RAM,
-        self.send_data(0x00)
-        self.send_data(0x80)
+        self.send_command(0x1A, 0x64, 0x00)  # Write to temperature register
 
+        self.send_command(0x22, 0x91)  # Load temperature value
+        self.send_command(0x20)
         self.wait_busy()
 
     def getbuffer(self, image: Image.Image) -> Any:
@@ -193,30 +255,33 @@ class EPD:
         Returns:
             Any: Generated buffer
         """
-        # Rotate the image because screen is placed at 180°
-        img = image.rotate(180)
-
-        imwidth, imheight = img.size
+        imwidth, imheight = image.size
         logger.debug(f"imwidth {imwidth}, imheight {imheight}")
+        # Rotate the image because screen is placed at 180°, transpose is a
+        # lossless pixel copy unlike rotate
         if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
+            img = image.transpose(Image.Transpose.ROTATE_180)
         elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
+            # image has correct dimensions, but needs to be rotated too
+            img = image.transpose(Image.Transpose.ROTATE_270)
         else:
             logger.warning(
                 "Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height)
             )
             # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
+            return bytes(self.linewidth * self.height)
 
-        return bytearray(img.tobytes())  # type: ignore
+        # Views are already drawn in 1-bit mode, avoid a copy for them
+        if img.mode != "1":
+            img = img.convert("1")
+        # spidev writebytes2 takes the bytes as they are, no need for a mutable copy
+        return img.tobytes()  # type: ignore
 
-    def display(self, image: bytearray) -> bool:
+    def display(self, image: bytes) -> bool:
         """Send and display the data on the screen.
 
         Args:
-            image (bytearray): Data to send to screen
+            image (bytes): Data to send to screen
         """
         self.send_command(0x24)
         self.send_data2(image)
@@ -224,6 +289,38 @@ class EPD:
         self.enter_deep_sleep()
         return is_ok
 
+    def display_fast(self, image: bytes) -> bool:
+        """Send and display the data on the screen with a fast full refresh.
+
+        Args:
+            image (bytes): Data to send to screen
+        """
+        self.send_command(0x24)
+        self.send_data2(image)
+        is_ok = self.turn_on_display_fast()
+        self.enter_deep_sleep()
+        return is_ok
+
+    def display_partial(self, image: bytes, base_image: bytes) -> bool:
+        """Send and display the data on the screen with a partial refresh.
+
+        Partial refresh is faster and does not flash the screen, but leaves
+        some ghosting: a full refresh must be done from time to time.
+
+        Args:
+            image (bytes): Data to send to screen
+            base_image (bytes): Data currently displayed on the screen
+        """
+        self.send_command(0x3C, 0x80)  # BorderWavefrom
+
+        self.send_command(0x26)
+        self.send_data2(base_image)
+        self.send_command(0x24)
+        self.send_data2(image)
+        is_ok = self.turn_on_display_part()
+        self.enter_deep_sleep()
+        return is_ok
+
     def displayPartBaseImage(self, image: Image.Image) -> None:
         """Refresh a base image.
 
@@ -243,13 +340,8 @@ class EPD:
         Args:
             color (int): Data to send to screen
         """
-        if self.width % 8 == 0:
-            linewidth = int(self.width / 8)
-        else:
-            linewidth = int(self.width / 8) + 1
-
         self.send_command(0x24)
-        self.send_data2([color] * int(self.height * linewidth))
+        self.send_data2(bytes((color,)) * (self.height * self.linewidth))
         self.turn_on_display()
 
     def enter_deep_sleep(self) -> None:
@@ -0,0 +1 @@
+"""GPIO sources for mapio_display."""
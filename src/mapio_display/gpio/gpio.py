@@ -0,0 +1,36 @@
+"""MAPIO GPIO chips access."""
+
+import datetime
+from functools import cache
+from typing import Any
+
+import gpiod  # type: ignore
+
+
+@cache
+def get_chip(number: int) -> Any:
+    """Get a GPIO chip, opened once and shared by all its users.
+
+    Args:
+        number (int): GPIO chip number
+
+    Returns:
+        Any: The gpiod chip
+    """
+    return gpiod.chip(number)
+
+
+def read_events(line: Any) -> list[Any]:
+    """Read all the events queued on a GPIO line, without blocking.
+
+    Args:
+        line (Any): The gpiod line, requested for events
+
+    Returns:
+        list[Any]: The events read, oldest first
+    """
+    events = []
+    # gpiod 1.5 has no bulk read, a zero timeout wait tells if another event is queued
+    while line.event_wait(datetime.timedelta(0)):
+        events.append(line.event_read())
+    return events
@@ -1,6 +1,9 @@
 """MAPIO leds controls."""
 
+import atexit
+import os
 from pathlib import Path
+from typing import Optional
 
 from loguru import logger
 
@@ -22,39 +25,73 @@ class LED:
             self.led_path = "/sys/class/leds/LED" + str(number) + "_" + color
         else:
             logger.warning("Wrong led parameters")
+            self.led_path = ""
 
-    def on(self) -> None:
-        """Set a led to ON."""
+        # Attributes written on each LED update are kept open until close
+        self._brightness_fd = self._open("brightness")
+        self._trigger_fd = self._open("trigger")
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Close the led sysfs attributes, the led cannot be used afterwards."""
+        for fd in (self._brightness_fd, self._trigger_fd):
+            if fd is not None:
+                os.close(fd)
+        self._brightness_fd = None
+        self._trigger_fd = None
+        atexit.unregister(self.close)
+
+    def _open(self, attribute: str) -> Optional[int]:
+        """Open a led sysfs attribute for writing.
+
+        Args:
+            attribute (str): Name of the attribute file
+
+        Returns:
+            Optional[int]: File descriptor, None if the led does not exist
+        """
         try:
-            with Path.open(Path(f"{self.led_path}/brightness"), "w") as brightness:
-                brightness.write("1")
+            return os.open(f"{self.led_path}/{attribute}", os.O_WRONLY)
         except OSError:
-            logger.warning("Unknown led")
+            return None
 
-    def off(self) -> None:
-        """Set a led to OFF."""
+    @staticmethod
+    def _write(fd: Optional[int], value: bytes) -> None:
+        """Write a value in an opened led sysfs attribute.
+
+        Args:
+            fd (Optional[int]): File descriptor of the attribute
+            value (bytes): Value to write
+        """
+        if fd is None:
+            logger.warning("Unknown led")
+            return
         try:
-            with Path.open(Path(f"{self.led_path}/brightness"), "w") as brightness:
-                brightness.write("0")
+            # sysfs attributes are always written from their start
+            os.pwrite(fd, value, 0)
         except OSError:
             logger.warning("Unknown led")
 
+    def on(self) -> None:
+        """Set a led to ON."""
+        self._write(self._brightness_fd, b"1")
+
+    def off(self) -> None:
+        """Set a led to OFF."""
+        self._write(self._brightness_fd, b"0")
+
     def blink(self, start: bool) -> None:
         """Make a led blinking."""
-        try:
-            with Path.open(Path(f"{self.led_path}/trigger"), "w") as trigger:
-                if start:
-                    trigger.write("timer")
-                else:
-                    trigger.write("none")
-            if start:
+        self._write(self._trigger_fd, b"timer" if start else b"none")
+        if start:
+            # Delay attributes only exist while the timer trigger is set
+            try:
                 with Path.open(Path(f"{self.led_path}/delay_on"), "w") as timer_on:
                     timer_on.write("100")
                 with Path.open(Path(f"{self.led_path}/delay_off"), "w") as timer_off:
                     timer_off.write("100")
-
-        except OSError:
-            logger.warning("Unknown led")
+            except OSError:
+                logger.warning("Unknown led")
 
     def reset(self, number: int) -> None:
         """Reset all color for a specific led."""
@@ -0,0 +1,30 @@
+"""Tests for `mapio_display.gpio.gpio`."""
+
+from unittest import mock
+
+import gpiod  # type: ignore
+
+from mapio_display.gpio.gpio import read_events
+
+
+def _line(pending: int) -> mock.Mock:
+    # The spec comes from the installed gpiod, calls to methods it lacks fail
+    line = mock.create_autospec(gpiod.line, instance=True)
+    line.event_wait.side_effect = [True] * pending + [False]
+    line.event_read.side_effect = [f"event{i}" for i in range(pending)]
+    return line
+
+
+def test_read_events_drains_queue() -> None:
+    line = _line(3)
+    assert read_events(line) == ["event0", "event1", "event2"]
+    assert line.event_read.call_count == 3
+    # Never blocks waiting for an event
+    for call in line.event_wait.call_args_list:
+        assert call.args[0].total_seconds() == 0
+
+
+def test_read_events_empty_queue() -> None:
+    line = _line(0)
+    assert read_events(line) == []
+    line.event_read.assert_not_called()
@@ -0,0 +1,84 @@
+"""Tests for `mapio_display.app.utils`."""
+
+import pytest
+
+from mapio_display.app.utils import battery_percent, bbox_diff, format_uptime
+
+LINEWIDTH = 16
+HEIGHT = 250
+
+
+def _buffer() -> bytearray:
+    return bytearray(b"\xff" * (LINEWIDTH * HEIGHT))
+
+
+def test_bbox_diff_identical() -> None:
+    assert bbox_diff(_buffer(), _buffer(), LINEWIDTH) is None
+
+
+@pytest.mark.parametrize(
+    ("column", "bit", "row"),
+    [
+        (0, 0x80, 0),
+        (0, 0x01, 10),
+        (LINEWIDTH - 1, 0x80, 100),
+        (LINEWIDTH - 1, 0x01, HEIGHT - 1),
+    ],
+)
+def test_bbox_diff_single_bit(column: int, bit: int, row: int) -> None:
+    new = _buffer()
+    new[row * LINEWIDTH + column] ^= bit
+    assert bbox_diff(new, _buffer(), LINEWIDTH) == (column, row, column, row)
+
+
+def test_bbox_diff_multi_row() -> None:
+    new = _buffer()
+    new[20 * LINEWIDTH + 7] = 0x00
+    new[30 * LINEWIDTH + 2] ^= 0x10
+    new[45 * LINEWIDTH + 11] ^= 0x01
+    assert bbox_diff(new, _buffer(), LINEWIDTH) == (2, 20, 11, 45)
+
+
+def test_bbox_diff_bytes_buffers() -> None:
+    new = _buffer()
+    new[-1] = 0x00
+    assert bbox_diff(bytes(new), bytes(_buffer()), LINEWIDTH) == (
+        LINEWIDTH - 1,
+        HEIGHT - 1,
+        LINEWIDTH - 1,
+        HEIGHT - 1,
+    )
+
+
+@pytest.mark.parametrize(
+    ("seconds", "expected"),
+    [
+        (0, "0 min"),
+        (59, "0 min"),
+        (5 * 60 + 30, "5 min"),
+        (3600, "1:00"),
+        (2 * 3600 + 3 * 60, "2:03"),
+        (86399, "23:59"),
+        (86400, "1 day"),
+        (3 * 86400 + 7200, "3 days"),
+    ],
+)
+def test_format_uptime(seconds: int, expected: str) -> None:
+    assert format_uptime(seconds) == expected
+
+
+@pytest.mark.parametrize(
+    ("voltage", "expected"),
+    [
+        (3.0, 0),
+        (3.25, 0),
+        (3.26, 25),
+        (3.4, 25),
+        (3.41, 50),
+        (3.75, 50),
+        (3.76, 100),
+        (4.2, 100),
+    ],
+)
+def test_battery_percent(voltage: float, expected: int) -> None:
+    assert battery_percent(voltage) == expected